@@ -1,89 +1,358 @@
-import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import NamedTuple
+import numpy as np
+import orjson
 import streamlit as st
+from change_log import flush_log, open_log
+
+INITIAL_CAPACITY = 64
+
+def store_string(column, index, value):
+    # Writes value into a numpy unicode column, first widening the column's dtype
+    # (4 bytes per character) if value would not fit, so nothing is ever cut short
+    if len(value) > column.dtype.itemsize // 4:
+        column = column.astype(f"U{len(value)}")
+    column[index] = value
+    return column
+
+class Book(NamedTuple):
+    # One book's fields, as handed to the UI and written to the log
+    title: str
+    author: str
+    publication_year: str
+    genre: str
+    has_read_book: bool
+
+@dataclass
+class Books:
+    # Column-oriented book collection: one list per field instead of one dict per book.
+    # Read flags and search keys live in numpy arrays (with spare capacity) so counting
+    # and searching run in C.
+    titles: list = field(default_factory=list)
+    authors: list = field(default_factory=list)
+    years: list = field(default_factory=list)
+    genres: list = field(default_factory=list)
+    read_flags: np.ndarray = field(default_factory=lambda: np.zeros(INITIAL_CAPACITY, dtype=bool))
+    titles_lc: np.ndarray = field(default_factory=lambda: np.empty(INITIAL_CAPACITY, dtype="U16"))
+    authors_lc: np.ndarray = field(default_factory=lambda: np.empty(INITIAL_CAPACITY, dtype="U16"))
+    title_index: dict = field(default_factory=dict)
+    # Bumped on every change, so results computed from the collection can tell they are stale
+    version: int = 0
+    # The cached collection is shared by every session's script thread; hold this while
+    # reading indexes back into rows or changing the collection together with the log
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False, compare=False)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def columns(self):
+        # Every per-book list column, in a fixed order
+        return (self.titles, self.authors, self.years, self.genres)
+
+    def append(self, title, author, publication_year, genre, has_read_book):
+        # Adds a book to the end of every column. Titles are unique (case-insensitively), so a
+        # book whose title is already present is skipped and False is returned
+        if title.lower() in self.title_index:
+            return False
+        self.title_index[title.lower()] = len(self.titles)
+        self.reserve(len(self.titles))
+        self.read_flags[len(self.titles)] = has_read_book
+        self.set_search_keys(len(self.titles), title, author)
+        self.titles.append(title)
+        self.authors.append(author)
+        self.years.append(publication_year)
+        self.genres.append(genre)
+        self.version += 1
+        return True
+
+    def unique_title(self, title):
+        # Returns title, or title with a " (2)", " (3)", ... suffix when another book already has it
+        candidate, number = title, 2
+        while candidate.lower() in self.title_index:
+            candidate = f"{title} ({number})"
+            number += 1
+        return candidate
+
+    def append_renamed(self, title, author, publication_year, genre, has_read_book):
+        # Adds a book read from storage, renaming it rather than dropping it when its title is
+        # taken (the collection allowed duplicate titles before). Returns the title it got
+        title = self.unique_title(title)
+        self.append(title, author, publication_year, genre, has_read_book)
+        return title
+
+    def pop(self, index):
+        # Removes the book at index by popping the last book into its slot, so no other index shifts
+        del self.title_index[self.titles_lc[index]]
+        last = len(self.titles) - 1
+        for column in self.columns():
+            moved = column.pop()
+            if index < last:
+                column[index] = moved
+        if index < last:
+            self.read_flags[index] = self.read_flags[last]
+            self.titles_lc[index] = self.titles_lc[last]
+            self.authors_lc[index] = self.authors_lc[last]
+            self.title_index[str(self.titles_lc[index])] = index
+        self.version += 1
+
+    def update(self, index, title, author, publication_year, genre, has_read_book):
+        # Overwrites a book's fields, re-keying the title index if the title changed.
+        # Callers make sure the new title does not belong to another book
+        del self.title_index[self.titles_lc[index]]
+        self.title_index[title.lower()] = index
+        self.titles[index] = title
+        self.authors[index] = author
+        self.years[index] = publication_year
+        self.genres[index] = genre
+        self.read_flags[index] = has_read_book
+        self.set_search_keys(index, title, author)
+        self.version += 1
+
+    def reserve(self, index):
+        # Doubles the numpy columns when index is past their capacity
+        if index == len(self.read_flags):
+            self.read_flags = np.concatenate((self.read_flags, np.zeros_like(self.read_flags)))
+            self.titles_lc = np.concatenate((self.titles_lc, np.empty_like(self.titles_lc)))
+            self.authors_lc = np.concatenate((self.authors_lc, np.empty_like(self.authors_lc)))
+
+    def set_search_keys(self, index, title, author):
+        # Stores the lowercased title and author, each in its own column sized to that field
+        self.titles_lc = store_string(self.titles_lc, index, title.lower())
+        self.authors_lc = store_string(self.authors_lc, index, author.lower())
+
+    def row(self, index):
+        # Builds a lightweight Book tuple for one book, for display and for writing the log
+        return Book(
+            self.titles[index],
+            self.authors[index],
+            self.years[index],
+            self.genres[index],
+            bool(self.read_flags[index])
+        )
+
+    def snapshot(self):
+        # The whole collection as one columnar log entry, without repeating the field names per book.
+        # Keys follow Book's field order, like every other log entry.
+        columns = (self.titles, self.authors, self.years, self.genres, self.read_flags[:len(self)].tolist())
+        return {"op": "snapshot", **dict(zip(Book._fields, columns))}
+
+def apply_change(books, change):
+    # Replays a single logged change (snapshot, add, update or delete) onto a collection
+    op = change.pop("op")
+    if op == "snapshot":
+        for row in zip(*(change[name] for name in Book._fields)):
+            books.append_renamed(*row)
+    elif op == "add":
+        books.append_renamed(**change)
+    elif op == "del":
+        index = books.title_index.get(change["title"].lower())
+        if index is not None:
+            books.pop(index)
+    elif op == "upd":
+        index = books.title_index.get(change.pop("old_title").lower())
+        if index is not None:
+            # A rename onto a title another book already has gets a suffix, keeping titles unique
+            if books.title_index.get(change["title"].lower(), index) != index:
+                change["title"] = books.unique_title(change["title"])
+            books.update(index, **change)
+
+@st.cache_resource(max_entries=1)
+def _load_books(path, mtime):
+    # Replays the change log into a collection, re-parsed only when the file's mtime changes
+    # (or the cache was cleared). Buffered changes are written out first so the parse sees them.
+    flush_log(path)
+    books = Books()
+    line_count = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                change = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # Skip a partially written line instead of losing the whole log
+                continue
+            apply_change(books, change)
+            line_count += 1
+    return books, line_count
 
 class BookClassroom:
     
     def __init__(self):
         # Initializes a new book collection with an empty list and set up file storage
-        if 'book_list' not in st.session_state:
-            st.session_state.book_list = []
-        self.storage_file = "books_data.json"
+        if 'books' not in st.session_state:
+            st.session_state.books = Books()
+        self.storage_file = "books_data.jsonl"
+        self.legacy_file = "books_data.json"
         self.read_from_file()
 
     def read_from_file(self):
-        # Loads books from json file into memory
+        # Loads books from the change log, reusing the cached collection while the file is unchanged
+        try:
+            mtime = os.stat(self.storage_file).st_mtime_ns
+        except FileNotFoundError:
+            # Fall back to the old single json file and move its books into the log. The log
+            # is written even when there is nothing to import, so the collection always comes
+            # from the cache and later buffered changes are not lost to a re-parse
+            st.session_state.books = Books()
+            renamed = 0
+            for book in self.read_legacy_file():
+                renamed += st.session_state.books.append_renamed(**book) != book["title"]
+            self.save_to_file()
+            if renamed:
+                st.warning(f"{renamed} book(s) shared a title with another book and were renamed with a number suffix.")
+            return
+
+        books, line_count = _load_books(self.storage_file, mtime)
+        st.session_state.books = books
+        # Compact the log once it holds more than twice as many changes as books
+        if line_count > 2 * len(books):
+            self.save_to_file()
+
+    def read_legacy_file(self):
+        # Loads books from the json file used before the change log existed
         try:
-            with open(self.storage_file, 'r') as file:
+            with open(self.legacy_file, 'rb') as file:
                 content = file.read().strip()
-                if content:  # Check if the file is not empty
-                    st.session_state.book_list = json.loads(content)
-                else:
-                    st.session_state.book_list = []
-        except (FileNotFoundError, json.JSONDecodeError):
-            # If the file doesn't exist or is not valid JSON, keep empty book list
-            st.session_state.book_list = []
+                return orjson.loads(content) if content else []
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return []
 
     def save_to_file(self):
-        # Store the current book collection to a json file for permanent storage.
-        with open(self.storage_file, "w") as file:
-            json.dump(st.session_state.book_list, file)
+        # Rewrite the log as a single columnar snapshot of the collection.
+        temp_file = self.storage_file + ".tmp"
+        with st.session_state.books.lock:
+            with open(temp_file, "wb") as file:
+                if st.session_state.books:
+                    file.write(orjson.dumps(st.session_state.books.snapshot(), option=orjson.OPT_APPEND_NEWLINE))
+            os.replace(temp_file, self.storage_file)
+            open_log(self.storage_file).reopen()
+        _load_books.clear()
+        # Cache the snapshot just written, so later buffered changes land on the cached collection
+        st.session_state.books, _ = _load_books(self.storage_file, os.stat(self.storage_file).st_mtime_ns)
+
+    def append_to_file(self, change):
+        # Append a single change to the log instead of rewriting the whole collection.
+        # The cached collection already holds the change, so the cache stays valid until
+        # a flush moves the file's mtime.
+        open_log(self.storage_file).append(change)
             
     def create_new_book(self, book_title, book_author, publication_year, book_genre, has_read_book):
         # Add new books to the collection
-        new_book = {
-            "title" : book_title,
-            "author" : book_author,
-            "publication_year": publication_year,
-            "genre": book_genre,
-            "has_read_book": has_read_book
-        }
-        
-        st.session_state.book_list.append(new_book)
-        self.save_to_file()
+        books = st.session_state.books
+        with books.lock:
+            if not books.append(book_title, book_author, publication_year, book_genre, has_read_book):
+                return False
+            self.append_to_file({"op": "add", **books.row(len(books) - 1)._asdict()})
         return True
 
     def delete_book(self, book_title):
         # Remove a book from the collection using it's title.
-        for book in st.session_state.book_list:
-            if book["title"].lower() == book_title.lower():
-                st.session_state.book_list.remove(book)
-                self.save_to_file()
-                return True
-        return False
-
-    def find_book(self, search_text):
-        # Search for books in the collection by title or author name.
-        found_books = [
-            book
-            for book in st.session_state.book_list
-            if search_text.lower() in book["title"].lower()
-            or search_text.lower() in book["author"].lower()
-        ]
-        return found_books
+        with st.session_state.books.lock:
+            index = st.session_state.books.title_index.get(book_title.lower())
+            if index is None:
+                return False
+            return self.delete_book_by_index(index)
+
+    def delete_book_by_index(self, index):
+        # Remove the book at a known position, without looking it up again.
+        # The index must come from a lookup made under the same hold of the lock.
+        with st.session_state.books.lock:
+            self.append_to_file({"op": "del", "title": st.session_state.books.titles[index]})
+            st.session_state.books.pop(index)
+        return True
+
+    def find_book(self, search_text, limit=None):
+        # Search for books whose title or author contains every one of the space-separated terms,
+        # returning at most `limit` of their indexes. The whole collection is always scanned;
+        # `limit` only trims the result.
+        if not search_text:
+            return []
+        books = st.session_state.books
+        with books.lock:
+            titles_lc = books.titles_lc[:len(books)].copy()
+            authors_lc = books.authors_lc[:len(books)].copy()
+        terms = search_text.lower().split() or [search_text.lower()]
+        found_books = np.ones(len(titles_lc), dtype=bool)
+        for term in terms:
+            found_books &= (np.char.find(titles_lc, term) >= 0) | (np.char.find(authors_lc, term) >= 0)
+        return np.flatnonzero(found_books)[:limit].tolist()
     
     def update_book(self, old_title, new_title, new_author, new_year, new_genre, has_read):
         # Modify the details of an existing book in the collection.
-        for book in st.session_state.book_list:
-            if book["title"].lower() == old_title.lower():
-                book["title"] = new_title if new_title else book["title"]
-                book["author"] = new_author if new_author else book["author"]
-                book["publication_year"] = new_year if new_year else book["publication_year"]
-                book["genre"] = new_genre if new_genre else book["genre"]
-                book["has_read_book"] = has_read
-                self.save_to_file()
+        with st.session_state.books.lock:
+            index = st.session_state.books.title_index.get(old_title.lower())
+            if index is None:
+                return False
+            return self.update_book_by_index(index, new_title, new_author, new_year, new_genre, has_read)
+
+    def update_book_by_index(self, index, new_title, new_author, new_year, new_genre, has_read):
+        # Modify the book at a known position in place, without looking it up again.
+        # The index must come from a lookup made under the same hold of the lock.
+        books = st.session_state.books
+        with books.lock:
+            old_title = books.titles[index]
+            # Refuse to rename a book onto another book's title
+            if new_title and new_title.lower() != books.titles_lc[index] and new_title.lower() in books.title_index:
+                return False
+
+            new_values = (
+                new_title if new_title else books.titles[index],
+                new_author if new_author else books.authors[index],
+                new_year if new_year else books.years[index],
+                new_genre if new_genre else books.genres[index],
+                has_read
+            )
+            # Nothing to store when the form was submitted unchanged
+            if new_values == books.row(index):
                 return True
-        return False
+
+            books.update(index, *new_values)
+            self.append_to_file({"op": "upd", "old_title": old_title, **books.row(index)._asdict()})
+            return True
 
     def show_reading_progress(self):
         # Calculate reading statistics
-        total_books = len(st.session_state.book_list)
+        total_books = len(st.session_state.books)
         if total_books == 0:
             return 0, 0, 0
             
-        books_read = sum(1 for book in st.session_state.book_list if book["has_read_book"])
+        books_read = int(st.session_state.books.read_flags[:total_books].sum())
         percentage = (books_read / total_books) * 100 if total_books > 0 else 0
         return total_books, books_read, percentage
 
+BOOKS_PER_PAGE = 50
+MAX_CHOICES = 20
+
+def describe_books(books, indexes, start=1):
+    # Builds one numbered markdown line per book, joined so a whole list renders in a single call.
+    # Indexes another session's delete has just moved past the end are skipped
+    lines = []
+    with books.lock:
+        for index in indexes:
+            if index >= len(books):
+                continue
+            book = books.row(index)
+            reading_status = "Read" if book.has_read_book else "Unread"
+            lines.append(f"{start + len(lines)}. **{book.title}** by {book.author} ({book.publication_year}) - {book.genre} - {reading_status}")
+    return "\n".join(lines)
+
+def select_book(manager, label):
+    # Narrows the collection with a search box, then offers at most MAX_CHOICES books to pick from
+    search_term = st.text_input("Filter by title or author", key=label)
+    with st.session_state.books.lock:
+        if search_term:
+            matches = manager.find_book(search_term, limit=MAX_CHOICES)
+        else:
+            matches = range(min(MAX_CHOICES, len(st.session_state.books)))
+        titles = [st.session_state.books.titles[index] for index in matches]
+    if not titles:
+        st.info("No matching books found.")
+        return None
+    return st.selectbox(label, titles)
+
 # Streamlit UI
 def main():
     st.set_page_config(page_title="Personal Library Manager", page_icon="📚")
@@ -101,12 +370,15 @@ def main():
     # View all books
     if menu == "View All Books":
         st.header("Your Book Collection")
-        if not st.session_state.book_list:
+        if not st.session_state.books:
             st.info("Your collection is empty.")
         else:
-            for i, book in enumerate(st.session_state.book_list, 1):
-                reading_status = "Read" if book["has_read_book"] else "Unread"
-                st.write(f"{i}. **{book['title']}** by {book['author']} ({book['publication_year']}) - {book['genre']} - {reading_status}")
+            total = len(st.session_state.books)
+            page_count = (total - 1) // BOOKS_PER_PAGE + 1
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1) if page_count > 1 else 1
+            start = (page - 1) * BOOKS_PER_PAGE
+            page_books = range(start, min(start + BOOKS_PER_PAGE, total))
+            st.markdown(describe_books(st.session_state.books, page_books, start + 1))
     
     # Add new book
     elif menu == "Add New Book":
@@ -120,7 +392,9 @@ def main():
             
             submit_button = st.form_submit_button("Add Book")
             if submit_button and title and author:
-                if manager.create_new_book(title, author, year, genre, has_read):
+                if title.lower() in st.session_state.books.title_index:
+                    st.error(f'A book titled "{title}" already exists.')
+                elif manager.create_new_book(title, author, year, genre, has_read):
                     st.success("Book added successfully!")
                 else:
                     st.error("Failed to add book.")
@@ -130,51 +404,64 @@ def main():
         st.header("Search Books")
         search_term = st.text_input("Enter search term")
         if search_term:
-            results = manager.find_book(search_term)
+            # Reruns triggered by other widgets reuse the last results while neither the
+            # search term nor the collection has changed. The collection object itself is kept
+            # and compared with `is`, since a reloaded one could reuse an old id() and version
+            books = st.session_state.books
+            cache_key = (search_term, books.version)
+            if st.session_state.get("last_search_books") is not books or st.session_state.last_search_key != cache_key:
+                st.session_state.last_search_results = manager.find_book(search_term)
+                st.session_state.last_search_books = books
+                st.session_state.last_search_key = cache_key
+            results = st.session_state.last_search_results
             if results:
                 st.subheader(f"Found {len(results)} book(s):")
-                for i, book in enumerate(results, 1):
-                    reading_status = "Read" if book["has_read_book"] else "Unread"
-                    st.write(f"{i}. **{book['title']}** by {book['author']} ({book['publication_year']}) - {book['genre']} - {reading_status}")
+                st.markdown(describe_books(st.session_state.books, results))
             else:
                 st.info("No matching books found.")
     
     # Update book
     elif menu == "Update Book":
         st.header("Update Book Details")
-        if not st.session_state.book_list:
+        if not st.session_state.books:
             st.info("Your collection is empty.")
         else:
-            book_titles = [book["title"] for book in st.session_state.book_list]
-            selected_book = st.selectbox("Select a book to update", book_titles)
-            
+            selected_book = select_book(manager, "Select a book to update")
+            # Read the selected book's current values in one hold of the lock
+            book = None
             if selected_book:
-                # Find the selected book
-                for book in st.session_state.book_list:
-                    if book["title"] == selected_book:
-                        with st.form("update_book_form"):
-                            st.write("Leave blank to keep existing value.")
-                            new_title = st.text_input("New Title", book["title"])
-                            new_author = st.text_input("New Author", book["author"])
-                            new_year = st.text_input("New Publication Year", book["publication_year"])
-                            new_genre = st.text_input("New Genre", book["genre"])
-                            new_has_read = st.checkbox("I have read this book", book["has_read_book"])
-                            
-                            update_button = st.form_submit_button("Update Book")
-                            if update_button:
-                                if manager.update_book(selected_book, new_title, new_author, new_year, new_genre, new_has_read):
-                                    st.success("Book updated successfully!")
-                                else:
-                                    st.error("Failed to update book.")
+                with st.session_state.books.lock:
+                    index = st.session_state.books.title_index.get(selected_book.lower())
+                    if index is not None:
+                        book = st.session_state.books.row(index)
+            
+            if selected_book and book is None:
+                st.error("Book not found.")
+            elif selected_book:
+                with st.form("update_book_form"):
+                    st.write("Leave blank to keep existing value.")
+                    new_title = st.text_input("New Title", book.title)
+                    new_author = st.text_input("New Author", book.author)
+                    new_year = st.text_input("New Publication Year", book.publication_year)
+                    new_genre = st.text_input("New Genre", book.genre)
+                    new_has_read = st.checkbox("I have read this book", book.has_read_book)
+                    
+                    update_button = st.form_submit_button("Update Book")
+                    if update_button:
+                        if new_title and new_title.lower() != book.title.lower() and new_title.lower() in st.session_state.books.title_index:
+                            st.error(f'A book titled "{new_title}" already exists.')
+                        elif manager.update_book(book.title, new_title, new_author, new_year, new_genre, new_has_read):
+                            st.success("Book updated successfully!")
+                        else:
+                            st.error("Failed to update book.")
     
     # Delete book
     elif menu == "Delete Book":
         st.header("Delete a Book")
-        if not st.session_state.book_list:
+        if not st.session_state.books:
             st.info("Your collection is empty.")
         else:
-            book_titles = [book["title"] for book in st.session_state.book_list]
-            selected_book = st.selectbox("Select a book to delete", book_titles)
+            selected_book = select_book(manager, "Select a book to delete")
             
             if selected_book and st.button("Delete Book"):
                 if manager.delete_book(selected_book):
@@ -0,0 +1,63 @@
+import atexit
+import threading
+import orjson
+
+FLUSH_EVERY = 16
+
+# Open log writers by path. This lives in its own module because Streamlit re-executes
+# app.py in a fresh namespace on every rerun, while imported modules stay loaded for the
+# life of the process; st.cache_resource would drop the writer (and anything it still
+# buffers) whenever the cache is cleared.
+_writers = {}
+# Every session's script runs in its own thread; this guards the writers table and each
+# writer's buffered file together with its pending count
+_lock = threading.RLock()
+
+class ChangeLog:
+    # Keeps the jsonl log open for appending and only flushes it every FLUSH_EVERY changes
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab", buffering=1 << 16)
+        self.pending = 0
+
+    def append(self, change):
+        line = orjson.dumps(change, option=orjson.OPT_APPEND_NEWLINE)
+        with _lock:
+            self.file.write(line)
+            self.pending += 1
+            if self.pending >= FLUSH_EVERY:
+                self.flush()
+
+    def flush(self):
+        with _lock:
+            self.file.flush()
+            self.pending = 0
+
+    def reopen(self):
+        # Points the handle at a freshly replaced log file; anything still buffered
+        # belongs to the old file and is already part of the snapshot that replaced it
+        with _lock:
+            self.file.close()
+            self.file = open(self.path, "ab", buffering=1 << 16)
+            self.pending = 0
+
+def open_log(path):
+    # The single append writer for a log file, created on first use
+    with _lock:
+        if path not in _writers:
+            _writers[path] = ChangeLog(path)
+        return _writers[path]
+
+def flush_log(path):
+    # Writes out any buffered changes for a log file, so re-reading it sees them
+    with _lock:
+        writer = _writers.get(path)
+        if writer is not None and writer.pending:
+            writer.flush()
+
+@atexit.register
+def _flush_all():
+    with _lock:
+        for writer in _writers.values():
+            writer.flush()